@@ -1,19 +1,120 @@
 import curses
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from functools import lru_cache
 import matplotlib.pyplot as plt
+import numpy as np
 import duckdb
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 
+# Spelled-out counts for the mood trend messages
+NUMBER_WORDS = ("zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten")
+
+@lru_cache(maxsize=1024)
+def _fit(line, max_width):
+    """Truncate a line with '...' so it fits in max_width columns"""
+    return line if len(line) <= max_width else line[:max_width - 3] + "..."
+
 class MoodTrackerCLI:
+    # Number of poems requested from PoetryDB per round trip
+    POEM_BATCH_SIZE = 10
+    # (connect, read) timeout in seconds for each PoetryDB request
+    POEM_FETCH_TIMEOUT = (2, 3)
+    # Number of mood poems sampled from the database per query
+    MOOD_POEM_BATCH_SIZE = 8
+
     def __init__(self, stdscr, db_path="poems.db"):
         self.stdscr = stdscr
-        self.dates = []
-        self.moods = []
+        # Mood records as compact NumPy arrays, kept sorted by date; the
+        # record list, chart and trend check all read from these
+        self._dates_np = np.empty(0, dtype='datetime64[D]')
+        self._moods_np = np.empty(0, dtype=np.int8)
         self.current_date = datetime.now().strftime("%Y-%m-%d")
         self.db_path = db_path
         
+        # Open the database once and reuse it for poem lookups and the mood log.
+        # The read-write connection locks the file for this session, so the
+        # scraper can't write to it while the tracker is running (and vice versa).
+        self._conn = None
+        # Shown on screen when poems and mood records are unavailable
+        self._db_error = None
+        if not os.path.exists(self.db_path):
+            self._db_error = f"No database at {self.db_path}; mood records won't be saved."
+        else:
+            conn = None
+            try:
+                conn = duckdb.connect(self.db_path)
+                # id records entry order, so same-date records reload in the
+                # order they were added
+                conn.execute("CREATE SEQUENCE IF NOT EXISTS mood_log_id_seq")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS mood_log (
+                        id BIGINT DEFAULT nextval('mood_log_id_seq'),
+                        date DATE NOT NULL,
+                        score TINYINT NOT NULL
+                    )
+                """)
+                # Mood logs created before the id column get it added (and backfilled)
+                conn.execute("ALTER TABLE mood_log ADD COLUMN IF NOT EXISTS id BIGINT DEFAULT nextval('mood_log_id_seq')")
+                self._conn = conn
+            except duckdb.IOException as e:
+                # DuckDB allows no other connection, even read-only, while
+                # another process holds the file
+                if conn is not None:
+                    conn.close()
+                self._db_error = "Database is in use by another process; poems and mood history unavailable."
+            except Exception as e:
+                if conn is not None:
+                    conn.close()
+                self._db_error = "Couldn't open the database; poems and mood history unavailable."
+        
+        if self._conn is not None:
+            try:
+                # Parse and plan the mood-poem query once per session.
+                # Reservoir sampling picks random rows in one pass instead of
+                # sorting every match; the filter sits in a subquery because a
+                # top-level USING SAMPLE is applied before WHERE. The sample
+                # comes back in table order, so only its few rows are shuffled.
+                self._conn.execute(f"""
+                    PREPARE poems_by_mood AS
+                    SELECT poem_name, writer_name, poem_text
+                    FROM (
+                        SELECT poem_name, writer_name, poem_text
+                        FROM poems
+                        WHERE mood_type = $1
+                    )
+                    USING SAMPLE reservoir({self.MOOD_POEM_BATCH_SIZE} ROWS)
+                    ORDER BY RANDOM()
+                """)
+            except Exception as e:
+                # No poems table yet; get_poem_by_mood will return None
+                pass
+            
+            self._load_mood_log()
+        
+        # Keep-alive HTTP session so repeated PoetryDB requests reuse one connection.
+        # It is only used by the background prefetch, so keep the retry budget
+        # small enough that stopping the worker on exit stays quick.
+        self._http = requests.Session()
+        retry = Retry(total=1, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        self._http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
+        # Buffer of fetched inspiration poems waiting to be shown, kept
+        # topped up by a background worker so menu presses don't wait on the network
+        self._poem_cache = deque()
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._refill_future = None
+        # Set by close() so an in-progress refill stops between attempts
+        self._stop_refill = threading.Event()
+        self._schedule_refill()
+        # Sampled database poems waiting to be shown, per mood_type
+        self._mood_poem_cache = {}
+        
         curses.start_color()
         # White text on blue background
         curses.init_pair(1, curses.COLOR_WHITE, curses.COLOR_BLUE)
@@ -45,40 +146,75 @@ class MoodTrackerCLI:
         curses.curs_set(0)
         return input_str
     
+    def _load_mood_log(self):
+        """Load saved mood records from the database, oldest first (entry order within a day)"""
+        try:
+            rows = self._conn.execute("SELECT date, score FROM mood_log ORDER BY date, id").fetchall()
+        except Exception as e:
+            return
+        
+        self._dates_np = np.array([record_date for record_date, _ in rows], dtype='datetime64[D]')
+        self._moods_np = np.array([score for _, score in rows], dtype=np.int8)
+    
+    def _save_mood_record(self, record_date, mood_score):
+        """
+        Persist a mood record to the mood_log table.
+        
+        Returns:
+            True if the record was saved, False otherwise
+        """
+        if self._conn is None:
+            return False
+        
+        try:
+            self._conn.execute("INSERT INTO mood_log (date, score) VALUES (?, ?)", [record_date, mood_score])
+            return True
+        except Exception as e:
+            # Keep the in-memory record even if it can't be saved
+            return False
+    
+    def _prefetch_poems(self, mood_type):
+        """
+        Sample a batch of poems for mood_type from the database into the cache.
+        Columns are fetched as NumPy arrays in one call instead of row by row.
+        """
+        # (EXECUTE can't take bound parameters, but mood_type is one of two literals)
+        columns = self._conn.execute(f"EXECUTE poems_by_mood('{mood_type}')").fetchnumpy()
+        cache = self._mood_poem_cache.setdefault(mood_type, deque())
+        cache.extend(
+            {
+                "poem_name": poem_name,
+                "writer_name": writer_name,
+                "poem_text": poem_text
+            }
+            for poem_name, writer_name, poem_text in zip(
+                columns["poem_name"], columns["writer_name"], columns["poem_text"]
+            )
+        )
+    
     def get_poem_by_mood(self, mood_score):
         """
         Get a random poem from the database based on mood score.
         If mood >= 6, return a 'happy' poem. If mood <= 5, return a 'sad' poem.
+        Poems are sampled in batches and served from a per-mood cache.
         
         Returns:
             dict with 'poem_name', 'writer_name', 'poem_text' or None if not found
         """
-        if not os.path.exists(self.db_path):
+        if self._conn is None:
             return None
         
         try:
-            conn = duckdb.connect(self.db_path)
-            
             # Determine mood_type based on score
             mood_type = "happy" if mood_score >= 6 else "sad"
             
-            # Get a random poem with the matching mood_type
-            result = conn.execute("""
-                SELECT poem_name, writer_name, poem_text
-                FROM poems
-                WHERE mood_type = ?
-                ORDER BY RANDOM()
-                LIMIT 1
-            """, [mood_type]).fetchone()
-            
-            conn.close()
+            # Refill the cache with a fresh random batch when it runs dry
+            if not self._mood_poem_cache.get(mood_type):
+                self._prefetch_poems(mood_type)
             
-            if result:
-                return {
-                    "poem_name": result[0],
-                    "writer_name": result[1],
-                    "poem_text": result[2]
-                }
+            cache = self._mood_poem_cache[mood_type]
+            if cache:
+                return cache.popleft()
             else:
                 return None
         except Exception as e:
@@ -110,39 +246,29 @@ class MoodTrackerCLI:
         empty_line = start_line + 3
         self.stdscr.addstr(empty_line, 1, "", curses.color_pair(1))
         
-        # Display poem text lines with character-by-character animation
+        # Display poem text lines
         poem_text = poem.get('poem_text', '')
         poem_lines = poem_text.split('\n') if poem_text else []
         
         current_line = start_line + 4
         max_width = curses.COLS - 2
-        lines_displayed = 0
+        max_line = curses.LINES - 2
+        color = curses.color_pair(1)
         
-        # Loop through poem lines
-        for poem_line in poem_lines:
-            # Have we reached the maximum number of lines?
-            if lines_displayed >= max_lines:
-                break
-            
-            # Do we have enough screen space?
-            if current_line >= curses.LINES - 2:
-                break
-            
-            # Handle line length; truncate if too long
-            display_line = poem_line
-            if len(poem_line) > max_width:
-                display_line = poem_line[:max_width - 3] + "..."
-            
-            # Display line character by character (typewriter effect)
-            x_pos = 1
-            for char in display_line:
-                self.stdscr.addstr(current_line, x_pos, char, curses.color_pair(1))
-                self.stdscr.refresh()
-                curses.napms(50)  # 50ms delay between characters
-                x_pos += 1
-            
-            current_line += 1
-            lines_displayed += 1
+        # Keep as many lines as max_lines and the screen allow; truncate long ones
+        line_count = max(0, min(max_lines, max_line - current_line))
+        display_lines = [
+            _fit(line, max_width) for line in poem_lines[:line_count]
+        ]
+        
+        # Display each line in one write
+        for offset, display_line in enumerate(display_lines):
+            self.stdscr.addstr(current_line + offset, 1, display_line, color)
+        current_line += len(display_lines)
+        
+        # Flush the header and all poem lines to the terminal at once
+        self.stdscr.noutrefresh()
+        curses.doupdate()
         
         return current_line
     
@@ -155,6 +281,8 @@ class MoodTrackerCLI:
         self.stdscr.addstr(5, 1, "3. View mood chart", curses.color_pair(1))
         self.stdscr.addstr(6, 1, "4. Inspirations", curses.color_pair(2) | curses.A_BOLD)
         self.stdscr.addstr(7, 1, "5. Exit", curses.color_pair(1))
+        if self._db_error is not None:
+            self.stdscr.addstr(11, 1, _fit(self._db_error, curses.COLS - 2), curses.color_pair(2))
         self.stdscr.addstr(9, 1, "Please choose an option (1-5): ", curses.color_pair(1))
         self.stdscr.refresh()
 
@@ -169,6 +297,14 @@ class MoodTrackerCLI:
         if not date_input:
             date_input = self.current_date  # Default to current date
         
+        try:
+            record_date = datetime.strptime(date_input, "%Y-%m-%d").date()
+        except ValueError:
+            self.stdscr.addstr(5, 1, "Invalid date! Please use the YYYY-MM-DD format.", curses.color_pair(1))
+            self.stdscr.refresh()
+            self.stdscr.getch()  # Wait for a key press
+            return
+        
         self.stdscr.clear()
         self.stdscr.bkgd(' ', curses.color_pair(1))
         self.stdscr.addstr(1, 1, "Enter mood score (1-10):", curses.color_pair(1))
@@ -179,9 +315,14 @@ class MoodTrackerCLI:
         try:
             mood_score = int(mood_input)
             if 1 <= mood_score <= 10:
-                self.dates.append(date_input)
-                self.moods.append(mood_score)
+                record_day = np.datetime64(record_date, 'D')
+                idx = np.searchsorted(self._dates_np, record_day, side='right')
+                self._dates_np = np.insert(self._dates_np, idx, record_day)
+                self._moods_np = np.insert(self._moods_np, idx, mood_score)
+                saved = self._save_mood_record(record_date, mood_score)
                 self.stdscr.addstr(4, 1, f"Record added: {date_input} - Mood: {mood_score}", curses.color_pair(1))
+                if not saved:
+                    self.stdscr.addstr(5, 1, _fit("Warning: record not saved to the mood log; it will be lost on exit.", curses.COLS - 2), curses.color_pair(2))
                 
                 # Get and display a poem based on mood
                 poem = self.get_poem_by_mood(mood_score)
@@ -200,33 +341,43 @@ class MoodTrackerCLI:
         self.stdscr.refresh()
         self.stdscr.getch()  # Wait for a key press
 
-    def check_mood_trends(self, start_line=5):
-        # If there are at least 3 mood records
-        if len(self.moods) >= 3:
-            # Check the last 3 moods
-            last_three_moods = self.moods[-3:]
+    def check_mood_trends(self, start_line=5, k=3):
+        # If there are at least k mood records
+        if len(self._moods_np) >= k:
+            # Check the k most recent days
+            recent_moods = self._moods_np[-k:]
 
-            # Check if the last 3 moods are all below 5 (low mood) or above 5 (high mood)
-            if all(mood < 5 for mood in last_three_moods):
-                self.stdscr.addstr(start_line, 1, "You've had three consecutive low moods. Consider reflecting on your feelings.", curses.color_pair(1))
-            elif all(mood > 5 for mood in last_three_moods):
-                self.stdscr.addstr(start_line, 1, "You've had three consecutive high moods. Great job staying positive!", curses.color_pair(1))
-        self.stdscr.refresh()
+            count = NUMBER_WORDS[k] if k < len(NUMBER_WORDS) else str(k)
+
+            # Check if the recent moods are all below 5 (low mood) or above 5 (high mood)
+            if np.all(recent_moods < 5):
+                self.stdscr.addstr(start_line, 1, f"You've had {count} consecutive low moods. Consider reflecting on your feelings.", curses.color_pair(1))
+            elif np.all(recent_moods > 5):
+                self.stdscr.addstr(start_line, 1, f"You've had {count} consecutive high moods. Great job staying positive!", curses.color_pair(1))
+        # Stage only; add_mood_record flushes the whole screen afterwards
+        self.stdscr.noutrefresh()
 
     def view_mood_records(self):
         self.stdscr.clear()
         self.stdscr.bkgd(' ', curses.color_pair(1))
-        self.stdscr.addstr(1, 1, "Mood Records:", curses.color_pair(1))
-        if not self.dates:
+        total = len(self._dates_np)
+        # Only the most recent records that fit on screen (rows 3 to LINES - 2)
+        shown = min(total, max(0, curses.LINES - 4))
+        if shown < total:
+            self.stdscr.addstr(1, 1, f"Mood Records (latest {shown} of {total}):", curses.color_pair(1))
+        else:
+            self.stdscr.addstr(1, 1, "Mood Records:", curses.color_pair(1))
+        if total == 0:
             self.stdscr.addstr(3, 1, "No records to display.", curses.color_pair(1))
         else:
-            for idx, (date, mood) in enumerate(zip(self.dates, self.moods)):
+            recent = zip(self._dates_np[total - shown:], self._moods_np[total - shown:])
+            for idx, (date, mood) in enumerate(recent):
                 self.stdscr.addstr(3 + idx, 1, f"{date} - Mood: {mood}", curses.color_pair(1))
         self.stdscr.refresh()
         self.stdscr.getch()
 
     def plot_mood_chart(self):
-        if not self.dates or not self.moods:
+        if len(self._dates_np) == 0:
             self.stdscr.clear()
             self.stdscr.bkgd(' ', curses.color_pair(1))
             self.stdscr.addstr(1, 1, "No records to display!", curses.color_pair(1))
@@ -234,13 +385,9 @@ class MoodTrackerCLI:
             self.stdscr.getch()
             return
 
-        # Sort dates and moods by date
-        sorted_dates_moods = sorted(zip(self.dates, self.moods), key=lambda x: x[0])
-        sorted_dates, sorted_moods = zip(*sorted_dates_moods)
-
-        # Plotting the mood chart
+        # Plotting the mood chart straight from the date-sorted arrays
         plt.figure(figsize=(10, 5))
-        plt.plot(sorted_dates, sorted_moods, marker='o', linestyle='-', color='b')
+        plt.plot(self._dates_np, self._moods_np, marker='o', linestyle='-', color='b')
         plt.xlabel('Date')
         plt.ylabel('Mood Score (1-10)')
         plt.title('Mood Tracker Over Time')
@@ -249,42 +396,71 @@ class MoodTrackerCLI:
         plt.tight_layout()
         plt.show()
     
-    def get_random_poem(self):
+    def _refill_poem_cache(self):
         """
-        Fetch a random poem from PoetryDB API with less than 1000 lines.
-        Keeps querying until a suitable poem is found.
-        
-        Returns:
-            dict with 'title', 'author', 'lines' or None if error
+        Fetch batches of PoetryDB poems with less than 1000 lines into the
+        inspiration cache until it holds at least one poem.
+        Runs on the background worker thread.
         """
-        max_attempts = 20  # Prevent infinite loops
+        max_attempts = 3  # Prevent infinite loops
         attempts = 0
         
-        while attempts < max_attempts:
+        while not self._poem_cache and attempts < max_attempts and not self._stop_refill.is_set():
+            attempts += 1
             try:
-                response = requests.get("https://poetrydb.org/random", timeout=5)
+                response = self._http.get(f"https://poetrydb.org/random/{self.POEM_BATCH_SIZE}", timeout=self.POEM_FETCH_TIMEOUT)
                 response.raise_for_status()
                 poems = response.json()
                 
-                if poems and len(poems) > 0:
-                    poem = poems[0]
+            except (requests.RequestException, json.JSONDecodeError, ValueError) as e:
+                continue
+            
+            if not isinstance(poems, list):
+                continue
+            
+            # Keep only poems with less than 1000 lines; a malformed entry
+            # is skipped without discarding the rest of the batch
+            for poem in poems:
+                try:
                     linecount = int(poem.get('linecount', 0))
-                    
-                    # Check if poem has less than 1000 lines
-                    if linecount < 1000:
-                        return {
-                            'title': poem.get('title', 'Untitled'),
-                            'author': poem.get('author', 'Unknown'),
-                            'lines': poem.get('lines', [])
-                        }
+                except (AttributeError, TypeError, ValueError) as e:
+                    continue
                 
-                attempts += 1
-            except (requests.RequestException, json.JSONDecodeError, ValueError, KeyError) as e:
-                attempts += 1
-                if attempts >= max_attempts:
-                    return None
+                if linecount < 1000:
+                    self._poem_cache.append({
+                        'title': poem.get('title', 'Untitled'),
+                        'author': poem.get('author', 'Unknown'),
+                        'lines': poem.get('lines', [])
+                    })
+    
+    def _schedule_refill(self):
+        """Start a background cache refill unless one is already running"""
+        if self._refill_future is None or self._refill_future.done():
+            self._refill_future = self._pool.submit(self._refill_poem_cache)
+    
+    def get_random_poem(self):
+        """
+        Get a random poem from PoetryDB API with less than 1000 lines.
+        Poems are prefetched in the background, so most calls return
+        immediately; when the cache is empty, wait for the pending fetch.
+        
+        Returns:
+            dict with 'title', 'author', 'lines' or None if error
+        """
+        if not self._poem_cache:
+            self._schedule_refill()
+            try:
+                self._refill_future.result()
+            except Exception as e:
+                pass
+        
+        poem = self._poem_cache.popleft() if self._poem_cache else None
+        
+        # Top the cache back up while the user reads this poem
+        if not self._poem_cache:
+            self._schedule_refill()
         
-        return None
+        return poem
     
     def display_inspiration_poem(self, poem, start_line, separator_length=50):
         """
@@ -315,31 +491,27 @@ class MoodTrackerCLI:
         empty_line = start_line + 3
         self.stdscr.addstr(empty_line, 1, "", curses.color_pair(1))
         
-        # Display poem lines with character-by-character animation
+        # Display poem lines
         poem_lines = poem.get('lines', [])
         current_line = start_line + 4
         max_width = curses.COLS - 2
+        max_line = curses.LINES - 2
+        color = curses.color_pair(1)
         
-        # Loop through poem lines
-        for poem_line in poem_lines:
-            # Do we have enough screen space?
-            if current_line >= curses.LINES - 2:
-                break
-            
-            # Handle line length; truncate if too long
-            display_line = poem_line
-            if len(poem_line) > max_width:
-                display_line = poem_line[:max_width - 3] + "..."
-            
-            # Display line character by character (typewriter effect)
-            x_pos = 1
-            for char in display_line:
-                self.stdscr.addstr(current_line, x_pos, char, curses.color_pair(1))
-                self.stdscr.refresh()
-                curses.napms(50)  # 50ms delay between characters
-                x_pos += 1
-            
-            current_line += 1
+        # Keep as many lines as the screen allows; truncate long ones
+        line_count = max(0, max_line - current_line)
+        display_lines = [
+            _fit(line, max_width) for line in poem_lines[:line_count]
+        ]
+        
+        # Display each line in one write
+        for offset, display_line in enumerate(display_lines):
+            self.stdscr.addstr(current_line + offset, 1, display_line, color)
+        current_line += len(display_lines)
+        
+        # Flush the header and all poem lines to the terminal at once
+        self.stdscr.noutrefresh()
+        curses.doupdate()
         
         return current_line
     
@@ -364,28 +536,46 @@ class MoodTrackerCLI:
         self.stdscr.refresh()
         self.stdscr.getch()
 
+    def close(self):
+        """Stop the prefetch worker and close the database connection and HTTP session"""
+        # Wait for any in-flight request to finish (bounded by POEM_FETCH_TIMEOUT)
+        # before closing the session the worker is using
+        self._stop_refill.set()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._http.close()
+
     def run(self):
-        while True:
-            self.draw_main_menu()
+        try:
+            while True:
+                self.draw_main_menu()
 
-            choice = self.stdscr.getch()
+                choice = self.stdscr.getch()
 
-            if choice == ord('1'):
-                self.add_mood_record()
-            elif choice == ord('2'):
-                self.view_mood_records()
-            elif choice == ord('3'):
-                self.plot_mood_chart()
-            elif choice == ord('4'):
-                self.show_inspirations()
-            elif choice == ord('5'):
-                break  # Exit the program
-            else:
-                self.stdscr.clear()
-                self.stdscr.bkgd(' ', curses.color_pair(1))
-                self.stdscr.addstr(1, 1, "Invalid choice! Please choose a valid option (1-5).", curses.color_pair(1))
-                self.stdscr.refresh()
-                self.stdscr.getch()
+                if choice == ord('1'):
+                    self.add_mood_record()
+                elif choice == ord('2'):
+                    self.view_mood_records()
+                elif choice == ord('3'):
+                    self.plot_mood_chart()
+                elif choice == ord('4'):
+                    self.show_inspirations()
+                elif choice == ord('5'):
+                    break  # Exit the program
+                elif choice == curses.KEY_RESIZE:
+                    # Pick up the new screen size; cached line fits are for the old width
+                    curses.update_lines_cols()
+                    _fit.cache_clear()
+                else:
+                    self.stdscr.clear()
+                    self.stdscr.bkgd(' ', curses.color_pair(1))
+                    self.stdscr.addstr(1, 1, "Invalid choice! Please choose a valid option (1-5).", curses.color_pair(1))
+                    self.stdscr.refresh()
+                    self.stdscr.getch()
+        finally:
+            self.close()
 
 def main(stdscr):
     mood_tracker = MoodTrackerCLI(stdscr)
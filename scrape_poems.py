@@ -1,9 +1,90 @@
 import requests
-from lxml import html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import html, etree
+import io
 import json
 from typing import Dict, List
 import duckdb
 
+# Shared keep-alive session so repeated requests reuse one connection
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+))
+
+# Field XPath expressions evaluated against each header/blockquote
+_XP_TITLE = etree.XPath('.//h2[@class="entry-title"]/a')
+_XP_POET = etree.XPath('.//h6[@class="poet-name"]')
+_XP_LINK = etree.XPath('.//a')
+_XP_PARAGRAPHS = etree.XPath('.//p')
+# Same as lxml.html's text_content(), which plain etree elements lack
+_XP_TEXT = etree.XPath('string()')
+
+def _extract_header(header) -> tuple:
+    """
+    Extract poem name and writer name from a post header element.
+    
+    Returns:
+        (poem_name, writer_name), either of which may be empty
+    """
+    # Extract poem name from h2.entry-title
+    poem_name = ""
+    poem_title_elem = _XP_TITLE(header)
+    if poem_title_elem:
+        poem_name = _XP_TEXT(poem_title_elem[0]).strip()
+    
+    # Extract writer name from h6.poet-name
+    writer_name = ""
+    poet_name_elem = _XP_POET(header)
+    if poet_name_elem:
+        full_text = _XP_TEXT(poet_name_elem[0]).strip()
+        # Try to extract from link first
+        link = _XP_LINK(poet_name_elem[0])
+        if link:
+            writer_name = _XP_TEXT(link[0]).strip()
+        elif "by " in full_text:
+            writer_name = full_text.split("by ", 1)[1].strip()
+        else:
+            writer_name = full_text
+    
+    return poem_name, writer_name
+
+def _extract_poem_text(blockquote) -> str:
+    """Extract only the poem text from the <p> tags of a blockquote element"""
+    poem_lines = []
+    for p in _XP_PARAGRAPHS(blockquote):
+        line = _XP_TEXT(p).strip()
+        if line:
+            poem_lines.append(line)
+    return "\n".join(poem_lines)
+
+def _post_id(elem) -> str:
+    """Return the id of the post an element sits in (post-*/div/elem), or an empty string"""
+    parent = elem.getparent()
+    if parent is None or parent.tag != "div":
+        return ""
+    post = parent.getparent()
+    if post is None:
+        return ""
+    post_id = post.get("id", "")
+    return post_id if post_id.startswith("post-") else ""
+
+def _discard_parsed(elem) -> None:
+    """
+    Free memory held by a fully processed element: clear its subtree, then
+    drop every sibling parsed before it and before each of its ancestors.
+    The ancestors themselves are kept for later elements.
+    """
+    elem.clear(keep_tail=True)
+    node = elem
+    while node.getparent() is not None:
+        while node.getprevious() is not None:
+            del node.getparent()[0]
+        node = node.getparent()
+
 def scrape_poem_analysis(url: str) -> Dict:
     """
     Scrape poem analysis page and extract header and blockquote elements.
@@ -16,65 +97,54 @@ def scrape_poem_analysis(url: str) -> Dict:
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _http.get(url, headers=headers, timeout=10)
         response.raise_for_status()
     except requests.RequestException as e:
         return {"error": f"Failed to fetch URL: {str(e)}"}
     
-    # Parse HTML
-    tree = html.fromstring(response.content)
-    
     results = {
         "poems": []
     }
     
-    # Find all post divs using the pattern from user's XPath
-    # The user provided: //*[@id="post-2612935"]/div/header and //*[@id="post-2612935"]/div/blockquote
-    # So we need to find all elements with id starting with "post-"
-    all_post_ids = tree.xpath('//*[starts-with(@id, "post-")]/@id')
+    # Posts follow the pattern //*[@id="post-2612935"]/div/header and
+    # //*[@id="post-2612935"]/div/blockquote; group the extracted fields by post id
+    post_headers = {}
+    post_blockquotes = {}
+    # Fallback: every entry header and entry quote on the page, in document order
+    entries = []
     
-    for post_id in all_post_ids:
-        # Build XPath for header and blockquote based on the pattern
-        header_xpath = f'//*[@id="{post_id}"]/div/header'
-        blockquote_xpath = f'//*[@id="{post_id}"]/div/blockquote'
+    # Stream-parse the HTML. Each outermost header/blockquote is handled once its
+    # end tag arrives, together with any header/blockquote nested inside it (in
+    # document order), so a nested match is never cleared before its container
+    # has been read. Afterwards the subtree and everything parsed before it are
+    # dropped, leaving only the ancestor chain that _post_id needs.
+    for event, elem in etree.iterparse(io.BytesIO(response.content), events=("end",),
+                                       tag=("header", "blockquote"), html=True):
+        if next(elem.iterancestors("header", "blockquote"), None) is not None:
+            continue  # Handled with its outermost header/blockquote
         
-        headers = tree.xpath(header_xpath)
-        blockquotes = tree.xpath(blockquote_xpath)
+        for target in elem.iter("header", "blockquote"):
+            post_id = _post_id(target)
+            if target.tag == "header":
+                fields = _extract_header(target)
+                if post_id:
+                    post_headers.setdefault(post_id, []).append(fields)
+                if target.get("class") == "entry-header":
+                    entries.append(("header", fields))
+            else:
+                poem_text = _extract_poem_text(target)
+                if post_id:
+                    post_blockquotes.setdefault(post_id, []).append(poem_text)
+                if target.get("class") == "entry-quote":
+                    entries.append(("blockquote", poem_text))
         
-        # Process each header-blockquote pair
-        for header in headers:
-            # Extract poem name from h2.entry-title
-            poem_name = ""
-            poem_title_elem = header.xpath('.//h2[@class="entry-title"]/a')
-            if poem_title_elem:
-                poem_name = poem_title_elem[0].text_content().strip()
-            
-            # Extract writer name from h6.poet-name
-            writer_name = ""
-            poet_name_elem = header.xpath('.//h6[@class="poet-name"]')
-            if poet_name_elem:
-                full_text = poet_name_elem[0].text_content().strip()
-                # Try to extract from link first
-                link = poet_name_elem[0].xpath('.//a')
-                if link:
-                    writer_name = link[0].text_content().strip()
-                elif "by " in full_text:
-                    writer_name = full_text.split("by ", 1)[1].strip()
-                else:
-                    writer_name = full_text
-            
+        _discard_parsed(elem)
+    
+    # Process each header-blockquote pair
+    for post_id, header_fields in post_headers.items():
+        for poem_name, writer_name in header_fields:
             # Find corresponding blockquote (should be in same post)
-            for blockquote in blockquotes:
-                # Extract only the poem text from <p> tags
-                poem_lines = []
-                p_tags = blockquote.xpath('.//p')
-                for p in p_tags:
-                    line = p.text_content().strip()
-                    if line:
-                        poem_lines.append(line)
-                
-                poem_text = "\n".join(poem_lines)
-                
+            for poem_text in post_blockquotes.get(post_id, []):
                 # Only add if we have all the data
                 if poem_name and writer_name and poem_text:
                     results["poems"].append({
@@ -86,50 +156,24 @@ def scrape_poem_analysis(url: str) -> Dict:
     
     # If no results with exact pattern, try alternative approach
     if not results["poems"]:
-        # Try finding all headers and blockquotes separately and match them
-        all_headers = tree.xpath('//header[@class="entry-header"]')
-        all_blockquotes = tree.xpath('//blockquote[@class="entry-quote"]')
-        
-        # Match headers with blockquotes (assuming they appear in order)
-        for i, header in enumerate(all_headers):
-            if i < len(all_blockquotes):
-                blockquote = all_blockquotes[i]
-                
-                # Extract poem name
-                poem_name = ""
-                poem_title_elem = header.xpath('.//h2[@class="entry-title"]/a')
-                if poem_title_elem:
-                    poem_name = poem_title_elem[0].text_content().strip()
-                
-                # Extract writer name
-                writer_name = ""
-                poet_name_elem = header.xpath('.//h6[@class="poet-name"]')
-                if poet_name_elem:
-                    full_text = poet_name_elem[0].text_content().strip()
-                    link = poet_name_elem[0].xpath('.//a')
-                    if link:
-                        writer_name = link[0].text_content().strip()
-                    elif "by " in full_text:
-                        writer_name = full_text.split("by ", 1)[1].strip()
-                    else:
-                        writer_name = full_text
-                
-                # Extract poem text
-                poem_lines = []
-                p_tags = blockquote.xpath('.//p')
-                for p in p_tags:
-                    line = p.text_content().strip()
-                    if line:
-                        poem_lines.append(line)
-                
-                poem_text = "\n".join(poem_lines)
-                
-                if poem_name and writer_name and poem_text:
-                    results["poems"].append({
-                        "poem_name": poem_name,
-                        "writer_name": writer_name,
-                        "poem_text": poem_text
-                    })
+        # Match each blockquote with the header most recently seen before it
+        last_header = None
+        for kind, value in entries:
+            if kind == "header":
+                last_header = value
+                continue
+            if last_header is None:
+                continue
+            poem_name, writer_name = last_header
+            poem_text = value
+            last_header = None
+            
+            if poem_name and writer_name and poem_text:
+                results["poems"].append({
+                    "poem_name": poem_name,
+                    "writer_name": writer_name,
+                    "poem_text": poem_text
+                })
     
     return results
 
@@ -145,19 +189,51 @@ def init_duckdb(db_path: str = "poems.db") -> duckdb.DuckDBPyConnection:
     """
     conn = duckdb.connect(db_path)
     
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS poems (
-            id INTEGER PRIMARY KEY,
-            poem_name VARCHAR NOT NULL,
-            writer_name VARCHAR NOT NULL,
-            poem_text TEXT NOT NULL,
-            mood_type VARCHAR NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    # Create sequence for auto-incrementing ID. When upgrading a database that
+    # predates the sequence, start it after the highest existing id. The checks,
+    # CREATE and ALTER run in one transaction so a failed upgrade leaves nothing behind.
+    conn.begin()
+    try:
+        seq_exists = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_sequences() WHERE sequence_name = 'poems_id_seq'"
+        ).fetchone()[0]
+        table_exists = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'poems'"
+        ).fetchone()[0]
+        if not seq_exists:
+            start_id = 1
+            if table_exists:
+                start_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM poems").fetchone()[0] + 1
+            conn.execute(f"CREATE SEQUENCE poems_id_seq START WITH {start_id}")
+        
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS poems (
+                id INTEGER PRIMARY KEY DEFAULT nextval('poems_id_seq'),
+                poem_name VARCHAR NOT NULL,
+                writer_name VARCHAR NOT NULL,
+                poem_text TEXT NOT NULL,
+                mood_type VARCHAR NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Check the column itself rather than the sequence, so a table left
+        # without a default is always repaired
+        id_default = conn.execute("""
+            SELECT column_default FROM duckdb_columns()
+            WHERE table_name = 'poems' AND column_name = 'id'
+        """).fetchone()[0]
+        if not id_default:
+            conn.execute("ALTER TABLE poems ALTER COLUMN id SET DEFAULT nextval('poems_id_seq')")
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
     
-    # Create sequence for auto-incrementing ID if needed
-    # DuckDB handles this automatically, but we ensure the table structure is correct
+    # Index mood_type so per-mood poem lookups don't scan the whole table
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_poems_mood ON poems(mood_type)")
     
     return conn
 
@@ -178,12 +254,22 @@ def insert_poems_to_duckdb(poems: List[Dict], mood_type: str, db_path: str = "po
         return 0
     
     # Initialize database
-    conn = init_duckdb(db_path)
+    try:
+        conn = init_duckdb(db_path)
+    except duckdb.IOException as e:
+        # e.g. the mood tracker holds the database open
+        print(f"Could not open {db_path}; is it in use by another process (such as the mood tracker)?")
+        print(f"  {str(e).splitlines()[0]}")
+        return 0
     
     inserted_count = 0
     failed_count = 0
     
     try:
+        # Run the whole batch in one explicit transaction
+        conn.begin()
+        
+        rows = []
         for poem in poems:
             poem_name = poem.get("poem_name", "").strip()
             writer_name = poem.get("writer_name", "").strip()
@@ -194,20 +280,15 @@ def insert_poems_to_duckdb(poems: List[Dict], mood_type: str, db_path: str = "po
                 failed_count += 1
                 continue
             
-            try:
-                # Get next ID
-                max_id_result = conn.execute("SELECT COALESCE(MAX(id), 0) FROM poems").fetchone()
-                next_id = (max_id_result[0] if max_id_result else 0) + 1
-                
-                # Insert poem into database
-                conn.execute("""
-                    INSERT INTO poems (id, poem_name, writer_name, poem_text, mood_type)
-                    VALUES (?, ?, ?, ?, ?)
-                """, [next_id, poem_name, writer_name, poem_text, mood_type])
-                inserted_count += 1
-            except Exception as e:
-                print(f"Error inserting poem '{poem_name}': {str(e)}")
-                failed_count += 1
+            rows.append((poem_name, writer_name, poem_text, mood_type))
+        
+        if rows:
+            # Insert all poems in a single batch; ids come from poems_id_seq
+            conn.executemany("""
+                INSERT INTO poems (poem_name, writer_name, poem_text, mood_type)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            inserted_count = len(rows)
         
         # Commit the transaction
         conn.commit()
@@ -219,6 +300,7 @@ def insert_poems_to_duckdb(poems: List[Dict], mood_type: str, db_path: str = "po
     except Exception as e:
         print(f"Error during insertion: {str(e)}")
         conn.rollback()
+        inserted_count = 0  # Nothing from the batch was kept
     finally:
         conn.close()
     
@@ -251,7 +333,7 @@ if __name__ == "__main__":
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _http.get(url, headers=headers, timeout=10)
         with open("debug_page.html", "w", encoding="utf-8") as f:
             f.write(response.text)
         print("Saved HTML to debug_page.html for inspection")
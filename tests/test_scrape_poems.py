@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scrape_poems
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def scrape_fixture(name):
+    """Run scrape_poem_analysis against a saved HTML page instead of the network"""
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        response = mock.Mock(content=f.read())
+    with mock.patch.object(scrape_poems._http, "get", return_value=response):
+        return scrape_poems.scrape_poem_analysis("https://example.com/")
+
+
+class ScrapePoemAnalysisTest(unittest.TestCase):
+    # The first three cases match the original tree-based (html.fromstring)
+    # parser; the fallback cases after them check the last-header pairing,
+    # which intentionally differs from the old pairing by index
+
+    def test_post_pattern(self):
+        self.assertEqual(scrape_fixture("posts.html")["poems"], [
+            {"poem_name": "Poem One", "writer_name": "Alice A", "poem_text": "Line one\nLine two"},
+            {"poem_name": "Poem Two", "writer_name": "Bob B", "poem_text": "Real text"},
+        ])
+
+    def test_fallback_pattern(self):
+        self.assertEqual(scrape_fixture("fallback.html")["poems"], [
+            {"poem_name": "F1", "writer_name": "Carol", "poem_text": "fa\nfb"},
+            {"poem_name": "F2", "writer_name": "Dan", "poem_text": "fc"},
+        ])
+
+    def test_nested_blockquote_keeps_inner_paragraphs(self):
+        self.assertEqual(scrape_fixture("nested_blockquote.html")["poems"], [
+            {"poem_name": "Nested Poem", "writer_name": "Éloïse", "poem_text": "résumé\ninner"},
+            {"poem_name": "Second", "writer_name": "Bob", "poem_text": "two"},
+        ])
+
+    def test_nested_entry_quote_in_fallback(self):
+        # The nested quote is read with its container and, having no header
+        # of its own, is not paired with the next one (the old parser gave
+        # F2 -> "inner")
+        self.assertEqual(scrape_fixture("nested_fallback.html")["poems"], [
+            {"poem_name": "F1", "writer_name": "Carol", "poem_text": "outer\ninner"},
+            {"poem_name": "F2", "writer_name": "Dan", "poem_text": "fc"},
+        ])
+
+    def test_orphan_header_in_fallback(self):
+        # A header without a quote doesn't shift later pairings (the old
+        # parser gave Lonely -> "ga", G1 -> "gb")
+        self.assertEqual(scrape_fixture("orphan_header.html")["poems"], [
+            {"poem_name": "G1", "writer_name": "Erin", "poem_text": "ga"},
+            {"poem_name": "G2", "writer_name": "Finn", "poem_text": "gb"},
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()